@@ -0,0 +1,173 @@
+import logging
+import os
+import sqlite3
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from config import DB_PATH, INIT_ACCOUNT_VALUE, TICKERS, TIMEFRAMES
+from series import CLOSE, SignalSeries
+
+logger = logging.getLogger(__name__)
+
+N_PATHS = 5000
+N_CHUNKS = 16  # Fixed so a seed gives the same paths whatever the pool size.
+WALK_FORWARD_WINDOW = 50
+WALK_FORWARD_STEP = 10
+PERCENTILES = (5, 25, 50, 75, 95)
+
+def extract_trades(signals: SignalSeries) -> pd.DataFrame:
+    """
+    Turns a signal series (rows from the 'signals' table or calculate_signals output)
+    into one row per closed trade, with the dollar pnl and the return on the account
+    value the trade was opened with.
+    """
+    if signals.empty:
+        return pd.DataFrame(columns=["timestamp", "pnl", "return"])
+
+    values = signals.account_value
+    prev_values = np.concatenate(([INIT_ACCOUNT_VALUE], values[:-1]))
+    closed = (signals.signal == CLOSE) & np.isfinite(values) & np.isfinite(prev_values) & (prev_values > 0)
+
+    pnl = values[closed] - prev_values[closed]
+    return pd.DataFrame({
+        "timestamp": signals.timestamp[closed],
+        "pnl": pnl,
+        "return": pnl / prev_values[closed],
+    })
+
+def load_trades(ticker: str, timeframe: str, db_path: str = DB_PATH) -> pd.DataFrame:
+    connection = sqlite3.connect(db_path)
+    try:
+        data = connection.execute("SELECT timestamp, signal, account_value FROM signals WHERE ticker = ? AND timeframe = ? ORDER BY timestamp ASC", (ticker, timeframe)).fetchall()
+    finally:
+        connection.close()
+    return extract_trades(SignalSeries.from_rows(ticker, timeframe, data, ("timestamp", "signal", "account_value")))
+
+def equity_paths(returns: np.ndarray, init_value: float = INIT_ACCOUNT_VALUE) -> np.ndarray:
+    """Compounds a (paths, trades) matrix of per-trade returns into equity curves."""
+    returns = np.atleast_2d(returns)
+    return init_value * np.cumprod(1.0 + returns, axis=1)
+
+def max_drawdowns(equity: np.ndarray, init_value: float = INIT_ACCOUNT_VALUE) -> np.ndarray:
+    """Largest peak-to-trough loss of every row, as a negative fraction of the peak."""
+    equity = np.atleast_2d(equity)
+    peaks = np.maximum.accumulate(np.maximum(equity, init_value), axis=1)
+    return (equity / peaks - 1.0).min(axis=1)
+
+def _simulate_chunk(returns: np.ndarray, n_paths: int, method: str, seed) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    if method == "bootstrap":
+        resampled = returns[rng.integers(0, len(returns), size=(n_paths, len(returns)))]
+    elif method == "permutation":
+        resampled = rng.permuted(np.broadcast_to(returns, (n_paths, len(returns))), axis=1)
+    else:
+        raise ValueError(f"Unknown Monte Carlo method: {method}")
+
+    equity = equity_paths(resampled)
+    return equity[:, -1] / INIT_ACCOUNT_VALUE - 1.0, max_drawdowns(equity)
+
+def monte_carlo(returns, *, n_paths: int = N_PATHS, method: str = "bootstrap", seed=None, workers: int = 1, executor=None) -> dict:
+    """
+    Resamples the trade returns into n_paths alternative histories and returns the
+    total return and max drawdown of every path. Paths are split into N_CHUNKS seeded
+    chunks, simulated on `executor` if given, in a pool of `workers` processes if
+    workers > 1, and in-process otherwise.
+    """
+    returns = np.asarray(returns, dtype=float)
+    returns = returns[np.isfinite(returns)]
+    if returns.size == 0 or n_paths <= 0:
+        return {"total_return": np.empty(0), "max_drawdown": np.empty(0)}
+
+    chunks = min(N_CHUNKS, n_paths)
+    sizes = [len(c) for c in np.array_split(np.arange(n_paths), chunks)]
+    seeds = np.random.SeedSequence(seed).spawn(chunks)
+    args = ([returns] * chunks, sizes, [method] * chunks, seeds)
+
+    if executor is not None:
+        results = list(executor.map(_simulate_chunk, *args))
+    elif workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_simulate_chunk, *args))
+    else:
+        results = list(map(_simulate_chunk, *args))
+
+    return {
+        "total_return": np.concatenate([r[0] for r in results]),
+        "max_drawdown": np.concatenate([r[1] for r in results]),
+    }
+
+def walk_forward(trades: pd.DataFrame, *, window: int = WALK_FORWARD_WINDOW, step: int = WALK_FORWARD_STEP) -> pd.DataFrame:
+    """Total return, max drawdown and win rate over rolling windows of `window` trades."""
+    columns = ["start", "end", "total_return", "max_drawdown", "win_rate"]
+    returns = trades["return"].to_numpy(dtype=float) if not trades.empty else np.empty(0)
+    if len(returns) < window or window <= 0:
+        return pd.DataFrame(columns=columns)
+
+    windows = np.lib.stride_tricks.sliding_window_view(returns, window)[::step]
+    starts = np.arange(0, len(returns) - window + 1, step)
+    timestamps = trades["timestamp"].to_numpy()
+
+    equity = equity_paths(windows)
+    return pd.DataFrame({
+        "start": pd.to_datetime(timestamps[starts], unit="ms", utc=True),
+        "end": pd.to_datetime(timestamps[starts + window - 1], unit="ms", utc=True),
+        "total_return": equity[:, -1] / INIT_ACCOUNT_VALUE - 1.0,
+        "max_drawdown": max_drawdowns(equity),
+        "win_rate": (windows > 0).mean(axis=1),
+    }, columns=columns)
+
+def summarize(samples: np.ndarray) -> dict:
+    if samples.size == 0:
+        return {f"p{p}": np.nan for p in PERCENTILES}
+    return dict(zip((f"p{p}" for p in PERCENTILES), np.percentile(samples, PERCENTILES)))
+
+def analyze(trades: pd.DataFrame, *, n_paths: int = N_PATHS, seed=None, executor=None) -> dict:
+    """
+    Bootstrap percentiles of total return and max drawdown, permutation percentiles of
+    max drawdown, and the walk-forward table. Reordering trades never changes the
+    compounded total return, so the permutation report only has the drawdown.
+    """
+    returns = trades["return"].to_numpy(dtype=float) if not trades.empty else np.empty(0)
+    report = {"trades": len(returns)}
+
+    sims = monte_carlo(returns, n_paths=n_paths, method="bootstrap", seed=seed, executor=executor)
+    report["bootstrap"] = {
+        "total_return": summarize(sims["total_return"]),
+        "max_drawdown": summarize(sims["max_drawdown"]),
+    }
+
+    sims = monte_carlo(returns, n_paths=n_paths, method="permutation", seed=seed, executor=executor)
+    report["permutation"] = {"max_drawdown": summarize(sims["max_drawdown"])}
+
+    report["walk_forward"] = walk_forward(trades)
+    return report
+
+def _fmt_pct(summary: dict) -> str:
+    return ", ".join(f"{k} {v * 100:.1f}%" for k, v in summary.items())
+
+def run_analysis(db_path: str = DB_PATH, *, n_paths: int = N_PATHS, seed=None, workers: int | None = None) -> dict:
+    reports = {}
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for timeframe in TIMEFRAMES:
+            for ticker in TICKERS:
+                trades = load_trades(ticker, timeframe, db_path)
+                if trades.empty:
+                    logger.info(f"{ticker}, {timeframe}: no closed trades to analyze.")
+                    continue
+
+                report = analyze(trades, n_paths=n_paths, seed=seed, executor=pool)
+                reports[(ticker, timeframe)] = report
+
+                logger.info(f"{ticker}, {timeframe}: {report['trades']} trades, {n_paths} paths.")
+                for method, stats in (("bootstrap", report["bootstrap"]), ("permutation", report["permutation"])):
+                    for stat, summary in stats.items():
+                        logger.info(f"  {method} {stat}: {_fmt_pct(summary)}")
+                wf = report["walk_forward"]
+                if not wf.empty:
+                    logger.info(f"  walk-forward ({len(wf)} windows): worst return {wf['total_return'].min() * 100:.1f}%, worst drawdown {wf['max_drawdown'].min() * 100:.1f}%")
+    return reports
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    run_analysis()
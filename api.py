@@ -0,0 +1,163 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from config import DB_PATH, TICKERS, TIMEFRAMES
+from data_handler import signals_version_path
+from series import SIGNAL_COLUMNS, SignalSeries
+from visualize_data import build_series, downsample
+
+logger = logging.getLogger(__name__)
+
+EQUITY_POINTS = 500
+POLL_INTERVAL = 1.0
+
+LATEST_QUERY = f"SELECT {', '.join(SIGNAL_COLUMNS)} FROM signals WHERE ticker = ? AND timeframe = ? ORDER BY timestamp DESC LIMIT 1"
+EQUITY_QUERY = "SELECT timestamp, account_value FROM signals WHERE ticker = ? AND timeframe = ? ORDER BY timestamp ASC"
+
+def _clean(value):
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+def _response(payload) -> tuple[bytes, str]:
+    body = json.dumps(payload, separators=(",", ":")).encode()
+    return body, f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+
+class SignalCache:
+    """
+    Pre-serialized JSON for the latest signal and the downsampled equity curve of every
+    (ticker, timeframe). Requests are dict lookups; SQLite is only read when
+    update_signals has rewritten the signals version file of db_path since the last build.
+    """
+
+    def __init__(self, db_path: str = DB_PATH, equity_points: int = EQUITY_POINTS):
+        self.db_path = db_path
+        self.version_path = signals_version_path(db_path)
+        self.equity_points = equity_points
+        self.responses = {}
+        self.version = None
+        self.lock = threading.Lock()
+
+    def _current_version(self):
+        try:
+            return os.stat(self.version_path).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def refresh(self, *, force: bool = False) -> bool:
+        version = self._current_version()
+        if not force and version == self.version:
+            return False
+        with self.lock:
+            self.responses = self._build()
+            self.version = version
+        logger.info(f"Signal cache rebuilt ({len(self.responses)} responses).")
+        return True
+
+    def _build(self) -> dict:
+        signals, equity = [], []
+        if os.path.exists(self.db_path):
+            connection = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+            try:
+                if connection.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='signals'").fetchone():
+                    for timeframe in TIMEFRAMES:
+                        for ticker in TICKERS:
+                            row = connection.execute(LATEST_QUERY, (ticker, timeframe)).fetchone()
+                            if row is None:
+                                continue
+                            latest = SignalSeries.from_rows(ticker, timeframe, [row]).to_records()[0]
+                            signals.append({"ticker": ticker, "timeframe": timeframe, **latest})
+
+                            rows = connection.execute(EQUITY_QUERY, (ticker, timeframe)).fetchall()
+                            s = downsample(build_series(SignalSeries.from_rows(ticker, timeframe, rows, ("timestamp", "account_value"))), self.equity_points)
+                            points = [[ts, _clean(value)] for ts, value in zip(s.index.as_unit("ms").asi8.tolist(), s.values.tolist())]
+                            equity.append({"ticker": ticker, "timeframe": timeframe, "points": points})
+            finally:
+                connection.close()
+
+        responses = {("/signals", None, None): _response(signals), ("/equity", None, None): _response(equity)}
+        for item in signals:
+            responses[("/signals", item["ticker"], item["timeframe"])] = _response(item)
+        for item in equity:
+            responses[("/equity", item["ticker"], item["timeframe"])] = _response(item)
+        return responses
+
+    def get(self, path: str, ticker: str | None = None, timeframe: str | None = None):
+        return self.responses.get((path, ticker, timeframe))
+
+    def watch(self, interval: float = POLL_INTERVAL) -> threading.Thread:
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.refresh()
+                except Exception:
+                    logger.error("Failed to refresh signal cache", exc_info=True)
+
+        thread = threading.Thread(target=loop, daemon=True)
+        thread.start()
+        return thread
+
+def make_handler(cache: SignalCache):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status: int, body: bytes = b"", etag: str | None = None):
+            self.send_response(status)
+            if etag:
+                self.send_header("ETag", etag)
+                self.send_header("Cache-Control", "no-cache")
+            if body:
+                self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if body:
+                self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            query = dict(parse_qsl(url.query))
+            ticker, timeframe = query.get("ticker"), query.get("timeframe")
+            if (ticker is None) != (timeframe is None):
+                self._send(400, b'{"error":"ticker and timeframe must be given together"}')
+                return
+
+            cached = cache.get(url.path.rstrip("/") or "/", ticker, timeframe)
+            if cached is None:
+                self._send(404, b'{"error":"not found"}')
+                return
+
+            body, etag = cached
+            if_none_match = self.headers.get("If-None-Match")
+            if if_none_match and (if_none_match.strip() == "*" or etag in (t.strip() for t in if_none_match.split(","))):
+                self._send(304, etag=etag)
+            else:
+                self._send(200, body, etag)
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    return Handler
+
+def serve(host: str = "127.0.0.1", port: int = 8000, db_path: str = DB_PATH):
+    cache = SignalCache(db_path)
+    cache.refresh(force=True)
+    cache.watch()
+    server = ThreadingHTTPServer((host, port), make_handler(cache))
+    logger.info(f"Serving signals on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    serve()
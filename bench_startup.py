@@ -0,0 +1,55 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+from cli import COMMANDS
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def import_time_us(stderr: str) -> int:
+    """Sum of the 'self' column of python -X importtime output, in microseconds."""
+    total = 0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        total += int(line.split("|")[0].split(":")[1])
+    return total
+
+def slowest_imports(stderr: str, top: int) -> list:
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not name.startswith("  "):
+            rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+def cold_start(command: list, runs: int) -> tuple[float, int, str]:
+    """Best wall time and import time over `runs` fresh interpreters."""
+    best_wall, best_imports, best_stderr = float("inf"), 0, ""
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-X", "importtime", *command], cwd=HERE, capture_output=True, text=True)
+        wall = time.perf_counter() - start
+        if result.returncode != 0:
+            raise RuntimeError(f"{' '.join(command)} failed:\n{result.stderr[-2000:]}")
+        if wall < best_wall:
+            best_wall, best_imports, best_stderr = wall, import_time_us(result.stderr), result.stderr
+    return best_wall, best_imports, best_stderr
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cold-start time of every cli.py subcommand.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=3, help="Show the slowest top-level imports of each subcommand.")
+    args = parser.parse_args()
+
+    baseline, _, _ = cold_start(["-c", "pass"], args.runs)
+    print(f"{'subcommand':<10} {'wall [ms]':>10} {'imports [ms]':>13}")
+    print(f"{'(python)':<10} {baseline * 1000:10.1f} {'':>13}")
+    for name in COMMANDS:
+        wall, imports_us, stderr = cold_start(["cli.py", "--import-only", name], args.runs)
+        slowest = ", ".join(f"{module} {us / 1000:.0f}" for us, module in slowest_imports(stderr, args.top))
+        print(f"{name:<10} {wall * 1000:10.1f} {imports_us / 1000:13.1f}   {slowest}")
@@ -0,0 +1,80 @@
+import argparse
+import importlib
+
+from config import INTRABAR_FILLS
+
+# Modules each subcommand needs. Nothing heavy is imported until a subcommand is chosen,
+# and --import-only stops right after these imports (see bench_startup.py).
+COMMANDS = {
+    "fetch":   ("Download new bars from Polygon.", ["data_handler", "polygon"]),
+    "process": ("Recompute entry/exit channels.", ["data_handler"]),
+    "signal":  ("Recompute signals and account value.", ["data_handler"]),
+    "plot":    ("Plot account value per timeframe.", ["visualize_data", "matplotlib.pyplot"]),
+    "notify":  ("Post the latest signals to Discord.", ["notifier"]),
+    "all":     ("Fetch, process, signal, analyze, plot and notify.", ["main", "polygon", "matplotlib.pyplot"]),
+    "serve":   ("Serve cached signals and equity curves over HTTP.", ["api"]),
+}
+
+def fetch(args):
+    from data_handler import setup_logging, migrate_database, update_database
+    setup_logging()
+    migrate_database()
+    update_database(update_all=args.all)
+
+def process(args):
+    from data_handler import setup_logging, process_data
+    setup_logging()
+    process_data(update_all=args.all)
+
+def signal(args):
+    from data_handler import setup_logging, migrate_database, update_signals
+    setup_logging()
+    migrate_database()
+    update_signals(update_all=args.all, intrabar=args.intrabar)
+
+def plot(args):
+    from visualize_data import plot_account_value
+    plot_account_value()
+
+def notify(args):
+    from notifier import send_discord_message
+    send_discord_message()
+
+def run_all(args):
+    from main import main
+    main(intrabar=args.intrabar)
+
+def run_serve(args):
+    import logging
+    from api import serve
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    serve(args.host, args.port)
+
+HANDLERS = {"fetch": fetch, "process": process, "signal": signal, "plot": plot, "notify": notify, "all": run_all, "serve": run_serve}
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="futuresbot")
+    parser.add_argument("--import-only", action="store_true", help="Import what the subcommand needs and exit.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, (help_text, _) in COMMANDS.items():
+        sub = subparsers.add_parser(name, help=help_text)
+        if name in ("fetch", "process", "signal"):
+            sub.add_argument("--all", action="store_true", help="Rebuild from scratch instead of updating incrementally.")
+        if name in ("signal", "all"):
+            sub.add_argument("--intrabar", action=argparse.BooleanOptionalAction, default=INTRABAR_FILLS,
+                             help="Resolve bars touching both stop and target with 1-minute bars (default: config.INTRABAR_FILLS).")
+        if name == "serve":
+            sub.add_argument("--host", default="127.0.0.1")
+            sub.add_argument("--port", type=int, default=8000)
+    return parser
+
+def run(argv=None):
+    args = build_parser().parse_args(argv)
+    for module in COMMANDS[args.command][1]:
+        importlib.import_module(module)
+    if args.import_only:
+        return
+    HANDLERS[args.command](args)
+
+if __name__ == "__main__":
+    run()
@@ -11,10 +11,18 @@ def load_env(path=".env"):
             key, value = line.split("=", 1)
             os.environ[key] = value
 
-load_env()
+SECRETS = ("DISCORD_WEBHOOK_URL", "API_KEY")
+_env_loaded = False
 
-DISCORD_WEBHOOK_URL = os.getenv("DISCORD_WEBHOOK_URL")
-API_KEY = os.getenv("API_KEY")
+def __getattr__(name):
+    # Secrets are read on first access so that importing config does not parse .env.
+    global _env_loaded
+    if name not in SECRETS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    if not _env_loaded:
+        load_env()
+        _env_loaded = True
+    return os.getenv(name)
 
 TICKERS = ["I:NDX"]
 # TICKERS = ["X:ETHUSD","C:GBPUSD", "C:EURUSD", "X:BTCUSD, "C:JPYUSD, "I:NDX"]
@@ -24,6 +32,7 @@ DB_PATH = "market.db"
 ATR_PERIOD = 20
 ENTRY_PERIOD = 20
 EXIT_PERIOD = 6
+INTRABAR_FILLS = False  # Resolve bars touching both stop and target with the 1-minute bars.
 RISK_PERCENT = 0.02
 INIT_ACCOUNT_VALUE = 10000.0  # Example account value.
 
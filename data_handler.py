@@ -1,13 +1,13 @@
 import sqlite3
 import logging
 
-import pandas as pd
+import numpy as np
 import time
 from dataclasses import asdict
 from datetime import datetime, timedelta
+from series import BarSeries, PROCESS_COLUMNS, SIGNAL_COLUMNS
 from strategy import calculate_signals
-from polygon import RESTClient
-from config import API_KEY, TICKERS, DB_PATH, ENTRY_PERIOD, EXIT_PERIOD, TIMEFRAMES
+from config import TICKERS, DB_PATH, ENTRY_PERIOD, EXIT_PERIOD, TIMEFRAMES, INTRABAR_FILLS
 
 BARS_TABLE = """CREATE TABLE IF NOT EXISTS
 bars(
@@ -95,8 +95,14 @@ def migrate_database(db_path: str = DB_PATH):
         connection.close()
         logger.info("Database migration check complete.")
 
+def rest_client():
+    # polygon is slow to import and only needed when fetching, so it is loaded here.
+    from polygon import RESTClient
+    from config import API_KEY
+    return RESTClient(API_KEY)
+
 def update_database(*, update_all: bool = False):
-    client = RESTClient(API_KEY)
+    client = rest_client()
 
     connection = sqlite3.connect(DB_PATH)
     cursor = connection.cursor()
@@ -144,6 +150,43 @@ def update_database(*, update_all: bool = False):
     connection.close()
     logger.info("Database updated.")
 
+def rolling_max(values: np.ndarray, period: int) -> np.ndarray:
+    out = np.full(len(values), np.nan)
+    if len(values) >= period:
+        out[period-1:] = np.lib.stride_tricks.sliding_window_view(values, period).max(axis=1)
+    return out
+
+def rolling_min(values: np.ndarray, period: int) -> np.ndarray:
+    out = np.full(len(values), np.nan)
+    if len(values) >= period:
+        out[period-1:] = np.lib.stride_tricks.sliding_window_view(values, period).min(axis=1)
+    return out
+
+def bars_since(breaks: np.ndarray) -> np.ndarray:
+    out, last = np.full(len(breaks), np.nan), None
+    for i, brk in enumerate(breaks.tolist()):
+        if brk:
+            out[i] = 0 if last is None else (i - last)
+            last = i
+        elif last is not None:
+            out[i] = i - last
+    return out
+
+def add_channels(bars: BarSeries) -> BarSeries:
+    bars.high_entry = rolling_max(bars.high, ENTRY_PERIOD)
+    bars.low_entry  = rolling_min(bars.low, ENTRY_PERIOD)
+
+    bars.high_exit = rolling_max(bars.high, EXIT_PERIOD)
+    bars.low_exit  = rolling_min(bars.low, EXIT_PERIOD)
+
+    bars.prev_high = np.concatenate(([np.nan], bars.high_entry[:-1]))[:len(bars)]
+    bars.prev_low  = np.concatenate(([np.nan], bars.low_entry[:-1]))[:len(bars)]
+
+    with np.errstate(invalid="ignore"):
+        bars.bars_since_high = bars_since(bars.high > bars.prev_high)
+        bars.bars_since_low  = bars_since(bars.low < bars.prev_low)
+    return bars
+
 def process_data(*, update_all: bool = False):
     connection =  sqlite3.connect(DB_PATH)
     cursor = connection.cursor()
@@ -158,67 +201,44 @@ def process_data(*, update_all: bool = False):
                 try:
                     last_ts = cursor.execute(f"SELECT MAX(timestamp) FROM process WHERE ticker = ? AND timeframe = ?", (ticker, timeframe)).fetchone()[0]
                     if not last_ts==None:
-                        cursor.execute("SELECT * FROM bars WHERE ticker = ? AND timeframe = ? AND timestamp >= ? ORDER BY timestamp ASC", (ticker, timeframe, last_ts))
+                        cursor.execute("SELECT timestamp, high, low FROM bars WHERE ticker = ? AND timeframe = ? AND timestamp >= ? ORDER BY timestamp ASC", (ticker, timeframe, last_ts))
                     else:
-                        cursor.execute("SELECT * FROM bars WHERE ticker = ? AND timeframe = ? ORDER BY timestamp ASC", (ticker, timeframe)) 
+                        cursor.execute("SELECT timestamp, high, low FROM bars WHERE ticker = ? AND timeframe = ? ORDER BY timestamp ASC", (ticker, timeframe)) 
                 except:
-                    cursor.execute("SELECT * FROM bars WHERE ticker = ? AND timeframe = ? ORDER BY timestamp ASC", (ticker, timeframe))
+                    cursor.execute("SELECT timestamp, high, low FROM bars WHERE ticker = ? AND timeframe = ? ORDER BY timestamp ASC", (ticker, timeframe))
             else:
-                cursor.execute("SELECT * FROM bars WHERE ticker = ? AND timeframe = ? ORDER BY timestamp ASC", (ticker, timeframe))        
-            
-            count = 0
-            bars = cursor.fetchall()
-            df = pd.DataFrame(bars, columns=['ticker', 'timeframe', 'timestamp', 'open', 'high', 'low', 'close', 'volume', 'vwap', 'transactions'])
+                cursor.execute("SELECT timestamp, high, low FROM bars WHERE ticker = ? AND timeframe = ? ORDER BY timestamp ASC", (ticker, timeframe))        
             
-            df["high_entry"] = df["high"].rolling(ENTRY_PERIOD, min_periods=ENTRY_PERIOD).max()
-            df["low_entry"]  = df["low"].rolling(ENTRY_PERIOD,  min_periods=ENTRY_PERIOD).min()
-
-            df["high_exit"] = df["high"].rolling(EXIT_PERIOD, min_periods=EXIT_PERIOD).max()
-            df["low_exit"]  = df["low"].rolling(EXIT_PERIOD,  min_periods=EXIT_PERIOD).min()
-
-            df["prev_high"] = df["high"].rolling(ENTRY_PERIOD, min_periods=ENTRY_PERIOD).max().shift(1)
-            df["prev_low"]  = df["low"].rolling(ENTRY_PERIOD,  min_periods=ENTRY_PERIOD).min().shift(1)
-
-            df["new_high"] = df["high"] > df["prev_high"]
-            df["new_low"]  = df["low"]  < df["prev_low"]
-
-            nh = df["new_high"].fillna(False).astype(bool).to_numpy()
-            nl = df["new_low" ].fillna(False).astype(bool).to_numpy()
-
-            dsh, last_hi = [None] * len(df), None
-            for i, brk in enumerate(nh):
-                if brk:
-                    dsh[i] = 0 if last_hi is None else (i - last_hi)
-                    last_hi = i
-                else:
-                    dsh[i] = None if last_hi is None else (i - last_hi)
-            df["bars_since_high"] = dsh
-
-            dsl, last_lo = [None] * len(df), None
-            for i, brk in enumerate(nl):
-                if brk:
-                    dsl[i] = 0 if last_lo is None else (i - last_lo)
-                    last_lo = i
-                else:
-                    dsl[i] = None if last_lo is None else (i - last_lo)
-            df["bars_since_low"] = dsl
-
-            for i, row in df.iterrows():
-                cursor.execute("""  REPLACE INTO process 
+            bars = add_channels(BarSeries.from_rows(ticker, timeframe, cursor.fetchall(), ("timestamp", "high", "low")))
+
+            cursor.executemany("""  REPLACE INTO process 
                                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", 
-                                    (row["ticker"], row["timeframe"], row["timestamp"], 
-                                    row["high_entry"], row["low_entry"], row["high_exit"], 
-                                    row["low_exit"], row["prev_high"], row["prev_low"], 
-                                    row["bars_since_high"], row["bars_since_low"])
-                            )
-                count += 1
-            logger.info(f"{ticker}: {count} rows processed.")
+                                    bars.rows(("timestamp",) + PROCESS_COLUMNS))
+            logger.info(f"{ticker}: {len(bars)} rows processed.")
     
     connection.commit()
     connection.close()
     logger.info("Data processed.")
 
-def update_signals(*, update_all: bool = False):
+SIGNAL_INPUTS = ("timestamp", "open", "high", "low", "close") + PROCESS_COLUMNS
+SIGNAL_INPUTS_QUERY = """SELECT b.timestamp, b.open, b.high, b.low, b.close, p.high_entry, p.low_entry, p.high_exit, p.low_exit, p.prev_high, p.prev_low, p.bars_since_high, p.bars_since_low
+FROM bars b JOIN process p ON p.ticker = b.ticker AND p.timeframe = b.timeframe AND p.timestamp = b.timestamp
+WHERE b.ticker = ? AND b.timeframe = ? AND b.timestamp >= ? ORDER BY b.timestamp ASC"""
+
+def load_minute_bars(cursor, ticker: str, start_ts: int) -> BarSeries:
+    bars = cursor.execute("SELECT timestamp, high, low FROM bars WHERE ticker = ? AND timeframe = '1 minute' AND timestamp >= ? ORDER BY timestamp ASC", (ticker, start_ts)).fetchall()
+    return BarSeries.from_rows(ticker, "1 minute", bars, ("timestamp", "high", "low"))
+
+def signals_version_path(db_path: str = DB_PATH) -> str:
+    """File rewritten after every signals commit to db_path."""
+    return f"{db_path}.signals-version"
+
+def mark_signals_updated(db_path: str = DB_PATH):
+    """Lets readers that cache the signals table (see api.py) know it has new rows."""
+    with open(signals_version_path(db_path), "w") as f:
+        f.write(str(int(datetime.now().timestamp()*1000)))
+
+def update_signals(*, update_all: bool = False, intrabar: bool = INTRABAR_FILLS):
     connection =  sqlite3.connect(DB_PATH)
     cursor = connection.cursor()
 
@@ -228,51 +248,35 @@ def update_signals(*, update_all: bool = False):
         logger.info(f"Processing timeframe: {timeframe}")  
 
         for ticker in TICKERS:
-            count = 0
+            start_ts = 0
             if not update_all:
                 try:
-                    last_ts = cursor.execute(f"SELECT MAX(timestamp) FROM signals WHERE ticker = '{ticker}' AND timeframe = '{timeframe}'").fetchone()[0]
+                    last_ts = cursor.execute(f"SELECT MAX(timestamp) FROM signals WHERE ticker = ? AND timeframe = ?", (ticker, timeframe)).fetchone()[0]
                     if not last_ts==None:
-                        bars = cursor.execute("SELECT ticker, timeframe, timestamp, open, high, low, close FROM bars WHERE ticker = ? AND timeframe = ? AND timestamp >= ? ORDER BY timestamp ASC", (ticker, timeframe, last_ts)).fetchall()
-                        process = cursor.execute("SELECT * FROM process WHERE ticker = ? AND timeframe = ? AND timestamp >= ? ORDER BY timestamp ASC", (ticker, timeframe, last_ts)).fetchall()
-                    else:
-                        bars = cursor.execute("SELECT ticker, timeframe, timestamp, open, high, low, close FROM bars WHERE ticker = ? AND timeframe = ? ORDER BY timestamp ASC", (ticker, timeframe)).fetchall()
-                        process = cursor.execute("SELECT * FROM process WHERE ticker = ? AND timeframe = ? ORDER BY timestamp ASC", (ticker, timeframe)).fetchall()
+                        start_ts = last_ts
                 except:
-                    bars = cursor.execute("SELECT ticker, timeframe, timestamp, open, high, low, close FROM bars WHERE ticker = ? AND timeframe = ? ORDER BY timestamp ASC", (ticker, timeframe)).fetchall()
-                    process = cursor.execute("SELECT * FROM process WHERE ticker = ? AND timeframe = ? ORDER BY timestamp ASC", (ticker, timeframe)).fetchall()
-            else:
-                bars = cursor.execute("SELECT ticker, timeframe, timestamp, open, high, low, close FROM bars WHERE ticker = ? AND timeframe = ? ORDER BY timestamp ASC", (ticker, timeframe)).fetchall()
-                process = cursor.execute("SELECT * FROM process WHERE ticker = ? AND timeframe = ? ORDER BY timestamp ASC", (ticker, timeframe)).fetchall()
-            
-            df = pd.DataFrame(bars, columns=['ticker', 'timeframe', 'timestamp', 'open', 'high', 'low', 'close'])
-            df2 = pd.DataFrame(process, columns=['ticker', 'timeframe', 'timestamp', 'high_entry', 'low_entry', 'high_exit', 'low_exit', 'prev_high', 'prev_low', 'bars_since_high', 'bars_since_low'])
-            df_combined = pd.merge(
-                df,
-                df2,
-                on=["ticker", "timeframe", "timestamp"],   
-                how="inner"                                
-            )
+                    pass
+
+            bars = BarSeries.from_rows(ticker, timeframe, cursor.execute(SIGNAL_INPUTS_QUERY, (ticker, timeframe, start_ts)).fetchall(), SIGNAL_INPUTS)
+
+            minute_bars = None
+            if intrabar and timeframe != "1 minute" and not bars.empty:
+                minute_bars = load_minute_bars(cursor, ticker, int(bars.timestamp.min()))
 
             try:
-                sig_df = calculate_signals(df_combined, ticker)
+                signals = calculate_signals(bars, minute_bars)
             except Exception:
                 logger.error(f"{ticker}: error in calculate_signals", exc_info=True)
                 continue
 
-            for i, row in sig_df.iterrows():
-                cursor.execute("""  REPLACE INTO signals 
+            cursor.executemany("""  REPLACE INTO signals 
                                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", 
-                                    (row["ticker"], row["timeframe"], row["timestamp"], 
-                                    row["signal"], row["position"], row["entry_price"], 
-                                    row["stop_price"], row["target_price"], row["position_basis"], 
-                                    row["unit_size"], row["account_value"], row["wins"], row["losses"])  
-                            )
-                count += 1
-            logger.info(f"{ticker}: {count} signals calculated.")
+                                    signals.rows(SIGNAL_COLUMNS))
+            logger.info(f"{ticker}: {len(signals)} signals calculated.")
         
     connection.commit()
     connection.close()
+    mark_signals_updated(DB_PATH)
     logger.info("Signals calculated.")
 
 def setup_logging() -> None:
@@ -285,12 +289,12 @@ def setup_logging() -> None:
     global logger
     logger = logging.getLogger(__name__)
 
-def refresh_data(*, update_all: bool = False, process_all: bool = False, signal_all: bool = False):
+def refresh_data(*, update_all: bool = False, process_all: bool = False, signal_all: bool = False, intrabar: bool = INTRABAR_FILLS):
     setup_logging()
     migrate_database()
     update_database(update_all=update_all)
     process_data(update_all=process_all)
-    update_signals(update_all=signal_all)
+    update_signals(update_all=signal_all, intrabar=intrabar)
 
 if __name__ == "__main__":
     refresh_data()
\ No newline at end of file
@@ -0,0 +1,285 @@
+import argparse
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import ExitStack
+from dataclasses import asdict, dataclass, fields
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+
+import data_handler
+import main
+import notifier
+from strategy import TIMESPAN_MS
+
+logger = logging.getLogger(__name__)
+
+STAGES = ["update_database", "process_data", "update_signals", "plot_account_value", "send_discord_message", "run_analysis"]
+WEBHOOKS_FILE = "webhooks.json"
+
+@dataclass
+class ReplayAgg:
+    open: float = None
+    high: float = None
+    low: float = None
+    close: float = None
+    volume: float = None
+    vwap: float = None
+    timestamp: int = None
+    transactions: int = None
+    otc: bool = None
+
+def _to_agg(row: dict) -> ReplayAgg:
+    return ReplayAgg(**{f.name: row.get(f.name) for f in fields(ReplayAgg)})
+
+def _fixture_name(ticker: str, multiplier, timespan: str) -> str:
+    return f"{ticker.replace(':', '_')}_{multiplier}_{timespan}.json"
+
+class RecordingClient:
+    """Wraps a RESTClient and writes every list_aggs response to the fixture directory."""
+
+    def __init__(self, client, fixtures_dir: str):
+        self.client = client
+        self.fixtures_dir = fixtures_dir
+
+    def list_aggs(self, ticker, multiplier, timespan, from_, to, **kwargs):
+        rows = [asdict(a) for a in self.client.list_aggs(ticker, multiplier, timespan, from_, to, **kwargs)]
+        path = os.path.join(self.fixtures_dir, _fixture_name(ticker, multiplier, timespan))
+        with open(path, "w") as f:
+            json.dump(rows, f)
+        return [_to_agg(row) for row in rows]
+
+class ReplayClient:
+    """Serves recorded aggs, hiding every bar that has not closed yet on the replay clock."""
+
+    def __init__(self, fixtures_dir: str):
+        self.fixtures_dir = fixtures_dir
+        self.cache = {}
+
+    def _load(self, ticker, multiplier, timespan):
+        key = (ticker, multiplier, timespan)
+        if key not in self.cache:
+            path = os.path.join(self.fixtures_dir, _fixture_name(ticker, multiplier, timespan))
+            rows = []
+            if os.path.exists(path):
+                with open(path) as f:
+                    rows = json.load(f)
+            ts = np.array([row["timestamp"] for row in rows], dtype=np.int64)
+            self.cache[key] = (ts, [_to_agg(row) for row in rows])
+        return self.cache[key]
+
+    def list_aggs(self, ticker, multiplier, timespan, from_, to, **kwargs):
+        ts, aggs = self._load(ticker, multiplier, timespan)
+        span_ms = int(multiplier) * TIMESPAN_MS[timespan]
+        lo = np.searchsorted(ts, from_, side="left")
+        hi = np.searchsorted(ts + span_ms, to, side="right")
+        return aggs[lo:hi]
+
+class ReplayClock:
+    """Replay time that starts at start_ms and runs `speed` times faster than the wall clock."""
+
+    def __init__(self, start_ms: int, speed: float):
+        self.speed = speed
+        self.rebase(start_ms)
+
+    def rebase(self, start_ms: int):
+        """Restarts the clock at start_ms from the current wall time."""
+        self.start_ms = start_ms
+        self.wall0 = time.perf_counter()
+
+    def now_ms(self) -> float:
+        return self.start_ms + (time.perf_counter() - self.wall0) * 1000 * self.speed
+
+    def wall_at(self, ms: float) -> float:
+        return self.wall0 + (ms - self.start_ms) / 1000 / self.speed
+
+    def sleep(self, seconds: float):
+        time.sleep(seconds / self.speed)
+
+    def datetime(self):
+        clock = self
+
+        class ReplayDatetime(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return datetime.fromtimestamp(clock.now_ms() / 1000, tz)
+
+        return ReplayDatetime
+
+class StubWebhook:
+    """Local stand-in for the Discord webhook that timestamps every request it receives."""
+
+    def __init__(self, statuses=None):
+        self.statuses = list(statuses or [])
+        self.received = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                stub.received.append(time.perf_counter())
+                status = stub.statuses[(len(stub.received) - 1) % len(stub.statuses)] if stub.statuses else 204
+                self.send_response(status)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/webhook"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+def _timed(name, func, timings):
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            timings[name] = time.perf_counter() - start
+    return wrapper
+
+def record(fixtures_dir: str):
+    """
+    Runs main.main() against the live API and webhook, saving what it sends and receives.
+    It runs on an empty database in a temporary directory so the fixtures hold the full
+    history that replay() loads on its warm-up run.
+    """
+    fixtures_dir = os.path.abspath(fixtures_dir)
+    os.makedirs(fixtures_dir, exist_ok=True)
+    webhooks = []
+    requests = notifier.requests
+
+    def post(url, **kwargs):
+        response = requests.post(url, **kwargs)
+        files = kwargs.get("files") or {}
+        webhooks.append({
+            "json": kwargs.get("json"),
+            "data": kwargs.get("data"),
+            "files": [name for name, _ in files.values()],
+            "status": response.status_code,
+        })
+        return response
+
+    recording_requests = SimpleNamespace(post=post, HTTPError=requests.HTTPError)
+    rest_client = data_handler.rest_client
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir, ExitStack() as stack:
+        os.chdir(workdir)
+        stack.callback(os.chdir, cwd)
+        stack.enter_context(mock.patch.object(data_handler, "rest_client", lambda: RecordingClient(rest_client(), fixtures_dir)))
+        stack.enter_context(mock.patch.object(notifier, "requests", recording_requests))
+        main.main()
+
+    with open(os.path.join(fixtures_dir, WEBHOOKS_FILE), "w") as f:
+        json.dump(webhooks, f, indent=2)
+
+def _tick_times(fixtures_dir: str, ticks: int) -> list:
+    """Bar close times of the last `ticks` bars of the finest recorded timeframe."""
+    finest = min(data_handler.TIMEFRAMES, key=lambda tf: int(tf.split(" ")[0]) * TIMESPAN_MS[tf.split(" ")[1]])
+    multiplier, timespan = finest.split(" ")
+    span_ms = int(multiplier) * TIMESPAN_MS[timespan]
+    client = ReplayClient(fixtures_dir)
+    closes = set()
+    for ticker in data_handler.TICKERS:
+        ts, _ = client._load(ticker, multiplier, timespan)
+        closes.update((ts + span_ms).tolist())
+    return sorted(closes)[-(ticks + 1):]
+
+def replay(fixtures_dir: str, *, ticks: int = 20, speed: float = 60.0) -> dict:
+    """
+    Replays the recorded responses through main.main() once per bar close, with the
+    replay clock running `speed` times faster than real time. Returns per-run seconds
+    for every stage, end to end from the later of the bar close and the run start to the
+    first webhook post, and the queue delay of runs that started after their bar closed.
+    """
+    fixtures_dir = os.path.abspath(fixtures_dir)
+    closes = _tick_times(fixtures_dir, ticks)
+    if len(closes) < 2:
+        raise ValueError(f"Not enough recorded bars in {fixtures_dir} to replay.")
+
+    statuses = []
+    webhooks_path = os.path.join(fixtures_dir, WEBHOOKS_FILE)
+    if os.path.exists(webhooks_path):
+        with open(webhooks_path) as f:
+            statuses = [w["status"] for w in json.load(f)]
+
+    clock = ReplayClock(closes[0], speed)
+    timings = {}
+    results = {stage: [] for stage in STAGES + ["end_to_end", "queue_delay"]}
+    cwd = os.getcwd()
+
+    with tempfile.TemporaryDirectory() as workdir, StubWebhook(statuses) as webhook, ExitStack() as stack:
+        os.chdir(workdir)
+        stack.callback(os.chdir, cwd)
+        stack.enter_context(mock.patch.object(data_handler, "rest_client", lambda: ReplayClient(fixtures_dir)))
+        stack.enter_context(mock.patch.object(data_handler, "datetime", clock.datetime()))
+        stack.enter_context(mock.patch.object(data_handler, "time", SimpleNamespace(sleep=clock.sleep)))
+        stack.enter_context(mock.patch.object(notifier, "DISCORD_WEBHOOK_URL", webhook.url))
+        for module, stage in [(data_handler, "update_database"), (data_handler, "process_data"), (data_handler, "update_signals"),
+                              (main, "run_analysis"), (main, "plot_account_value"), (main, "send_discord_message")]:
+            stack.enter_context(mock.patch.object(module, stage, _timed(stage, getattr(module, stage), timings)))
+
+        # The first bar close loads the full history into the empty database; it is not measured.
+        main.main()
+        clock.rebase(closes[0])
+
+        warned = False
+        for prev_ms, close_ms in zip(closes, closes[1:]):
+            bar_close = clock.wall_at(close_ms)
+            time.sleep(max(0.0, bar_close - time.perf_counter()))
+
+            timings.clear()
+            first_post = len(webhook.received)
+            run_start = time.perf_counter()
+            main.main()
+            run_time = time.perf_counter() - run_start
+
+            for stage in STAGES:
+                results[stage].append(timings.get(stage, np.nan))
+            start = max(bar_close, run_start)
+            results["end_to_end"].append(webhook.received[first_post] - start if len(webhook.received) > first_post else np.nan)
+            results["queue_delay"].append(max(0.0, run_start - bar_close))
+
+            interval = (close_ms - prev_ms) / 1000 / speed
+            if run_time > interval and not warned:
+                logger.warning(f"A run took {run_time:.2f}s but bars close every {interval:.2f}s at speed {speed:g}; "
+                               f"runs are queueing (see queue_delay). Use --speed {max(1.0, speed * interval / run_time):.0f} or lower to avoid it.")
+                warned = True
+
+    return {stage: np.array(values) for stage, values in results.items()}
+
+def latency_report(results: dict) -> dict:
+    return {stage: (np.nanpercentile(values, 50), np.nanpercentile(values, 99)) for stage, values in results.items() if np.isfinite(values).any()}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record and replay bar-close to Discord latency.")
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("--fixtures", default="fixtures")
+    parser.add_argument("--ticks", type=int, default=20)
+    parser.add_argument("--speed", type=float, default=60.0)
+    parser.add_argument("--sla", type=float, default=None, help="Fail if end-to-end p99 exceeds this many seconds.")
+    args = parser.parse_args()
+
+    if args.mode == "record":
+        record(args.fixtures)
+    else:
+        report = latency_report(replay(args.fixtures, ticks=args.ticks, speed=args.speed))
+        for stage, (p50, p99) in report.items():
+            print(f"{stage:<22} p50 {p50 * 1000:9.1f} ms   p99 {p99 * 1000:9.1f} ms")
+        if args.sla is not None and report.get("end_to_end", (0, np.inf))[1] > args.sla:
+            raise SystemExit(f"End-to-end p99 exceeds SLA of {args.sla}s.")
@@ -1,11 +1,23 @@
+import logging
+
+from config import INTRABAR_FILLS
+from analysis import run_analysis
 from data_handler import refresh_data
 from notifier import send_discord_message
 from visualize_data import plot_account_value
 
-def main():
-    refresh_data(process_all=True, signal_all = True)
+logger = logging.getLogger(__name__)
+
+def main(*, intrabar: bool = INTRABAR_FILLS):
+    refresh_data(process_all=True, signal_all = True, intrabar=intrabar)
     plot_account_value()   
     send_discord_message()
 
+    # Robustness analysis is informational only; it must never hold up or block the post.
+    try:
+        run_analysis()
+    except Exception:
+        logger.error("error in run_analysis", exc_info=True)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,12 +1,11 @@
 import requests
-import pandas as pd
-import numpy as np
 import sqlite3
+from math import isnan
 from datetime import datetime
 from config import DISCORD_WEBHOOK_URL, DB_PATH, TICKERS, TIMEFRAMES
 
 def _fmt(x):
-        if x is None or (isinstance(x, float) and np.isnan(x)):
+        if x is None or (isinstance(x, float) and isnan(x)):
             return "n/a"
         return f"{float(x):.4f}".rstrip("0").rstrip(".")
 
@@ -33,7 +32,7 @@ def build_discord_message(db_path: str = DB_PATH):
             if total_trades > 0:
                 win_rate_str = _fmt(wins / total_trades)
 
-            if sig in ("long", "short") and pd.notna(entry):
+            if sig in ("long", "short") and entry is not None and not isnan(entry):
                 messages.append(f"**{ticker}**, {timeframe}: {sig.capitalize()} at {_fmt(entry)}, stop {_fmt(stop)}, target {_fmt(targ)}, current win rate {win_rate_str} with {total_trades} total trades.")
             else:
                 messages.append(f"**{ticker}**, {timeframe}: No signal for next bar. Current win rate {win_rate_str} with {total_trades} total trades.")
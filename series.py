@@ -0,0 +1,143 @@
+import numpy as np
+
+BAR_COLUMNS = ("timestamp", "open", "high", "low", "close", "volume", "vwap", "transactions")
+PROCESS_COLUMNS = ("high_entry", "low_entry", "high_exit", "low_exit", "prev_high", "prev_low", "bars_since_high", "bars_since_low")
+SIGNAL_COLUMNS = ("timestamp", "signal", "position", "entry_price", "stop_price", "target_price", "position_basis", "unit_size", "account_value", "wins", "losses")
+
+NO_SIGNAL, LONG, SHORT, CLOSE = range(4)
+SIGNALS = ("no_signal", "long", "short", "close")
+SIGNAL_CODES = {name: code for code, name in enumerate(SIGNALS)}
+SIGNAL_CODES["no signal"] = NO_SIGNAL
+
+class ColumnSeries:
+    """
+    Struct-of-arrays base for one (ticker, timeframe) partition. Every column is a typed
+    NumPy array of the same length; ticker and timeframe are stored once for the series.
+    Only the columns that were passed in are allocated; any other column is created
+    empty (NaN or 0) the first time it is read.
+    """
+
+    __slots__ = ("ticker", "timeframe", "length")
+    COLUMNS = ()
+    DTYPES = {}
+
+    def __init__(self, ticker: str, timeframe: str, length: int = 0, **columns):
+        self.ticker = ticker
+        self.timeframe = timeframe
+        if columns:
+            length = len(next(iter(columns.values())))
+        self.length = length
+        for name, values in columns.items():
+            if name not in self.COLUMNS:
+                raise TypeError(f"{type(self).__name__} has no column '{name}'")
+            setattr(self, name, np.asarray(values, dtype=self.DTYPES.get(name, np.float64)))
+
+    def __getattr__(self, name):
+        # Only reached for slots that were never assigned.
+        if name not in type(self).COLUMNS:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+        dtype = self.DTYPES.get(name, np.float64)
+        values = np.full(self.length, np.nan if np.dtype(dtype).kind == "f" else 0, dtype=dtype)
+        setattr(self, name, values)
+        return values
+
+    def has(self, name: str) -> bool:
+        """Whether column `name` was loaded or assigned, without allocating it."""
+        try:
+            object.__getattribute__(self, name)
+        except AttributeError:
+            return False
+        return True
+
+    @property
+    def loaded(self) -> tuple:
+        return tuple(name for name in self.COLUMNS if self.has(name))
+
+    @classmethod
+    def _column_from_db(cls, name: str, values: tuple) -> np.ndarray:
+        dtype = cls.DTYPES.get(name, np.float64)
+        if name == "timestamp" or np.dtype(dtype).kind == "f":
+            return np.array(values, dtype=dtype)
+        # NULLs in integer-coded columns (e.g. a position stored as TEXT) read as 0.
+        return np.nan_to_num(np.array(values, dtype=np.float64), nan=0).astype(dtype)
+
+    @classmethod
+    def from_rows(cls, ticker: str, timeframe: str, rows: list, columns=None):
+        """Builds a series from sqlite rows whose fields are `columns`; other columns are not allocated."""
+        columns = cls.COLUMNS if columns is None else columns
+        if not rows:
+            return cls(ticker, timeframe)
+        return cls(ticker, timeframe, **{name: cls._column_from_db(name, values) for name, values in zip(columns, zip(*rows))})
+
+    def __len__(self) -> int:
+        return self.length
+
+    @property
+    def empty(self) -> bool:
+        return len(self) == 0
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in self.loaded)
+
+    def take(self, indexer):
+        columns = {name: getattr(self, name)[indexer] for name in self.loaded}
+        if not columns:
+            return type(self)(self.ticker, self.timeframe, len(range(self.length)[indexer]) if isinstance(indexer, slice) else self.length)
+        return type(self)(self.ticker, self.timeframe, **columns)
+
+    def _db_values(self, name: str) -> list:
+        return getattr(self, name).tolist()
+
+    def rows(self, columns=None):
+        """(ticker, timeframe, *columns) tuples of Python scalars, ready for executemany."""
+        columns = self.COLUMNS if columns is None else columns
+        n = len(self)
+        return zip([self.ticker] * n, [self.timeframe] * n, *(self._db_values(name) for name in columns))
+
+    def to_records(self) -> list:
+        """One dict of Python scalars per row, with NaN as None."""
+        names = self.loaded
+        columns = [[None if isinstance(v, float) and v != v else v for v in self._db_values(name)] for name in names]
+        return [dict(zip(names, values)) for values in zip(*columns)]
+
+    def to_frame(self):
+        import pandas as pd
+
+        df = pd.DataFrame({name: getattr(self, name) for name in self.loaded})
+        df.insert(0, "timeframe", self.timeframe)
+        df.insert(0, "ticker", self.ticker)
+        return df
+
+class BarSeries(ColumnSeries):
+    """OHLC bars of one partition, plus the channel columns filled in by process_data."""
+
+    __slots__ = BAR_COLUMNS + PROCESS_COLUMNS
+    COLUMNS = BAR_COLUMNS + PROCESS_COLUMNS
+    DTYPES = {"timestamp": np.int64}
+
+class SignalSeries(ColumnSeries):
+    """Output of calculate_signals. Signals are SIGNAL_CODES and positions are -1/0/1 as int8."""
+
+    __slots__ = SIGNAL_COLUMNS
+    COLUMNS = SIGNAL_COLUMNS
+    DTYPES = {"timestamp": np.int64, "signal": np.int8, "position": np.int8}
+
+    @classmethod
+    def _column_from_db(cls, name: str, values: tuple) -> np.ndarray:
+        if name == "signal":
+            return np.array([SIGNAL_CODES.get(v, NO_SIGNAL) for v in values], dtype=np.int8)
+        return super()._column_from_db(name, values)
+
+    def _db_values(self, name: str) -> list:
+        if name == "signal":
+            return [SIGNALS[code] for code in self.signal.tolist()]
+        if name == "position":
+            return self.position.astype(np.float64).tolist()
+        return super()._db_values(name)
+
+    def to_frame(self):
+        df = super().to_frame()
+        if self.has("signal"):
+            df["signal"] = np.array(SIGNALS, dtype=object)[self.signal]
+        return df
@@ -1,197 +1,191 @@
-import pandas as pd
 import numpy as np
-from math import floor
-from config import DOLLAR_PER_POINT, RISK_PERCENT, INIT_ACCOUNT_VALUE, TICK_SIZE, COMMISSIONS, MARGIN
-
-def calculate_signals(df, ticker):
-    if df.empty:
-        return df
-
-    out = df.copy()
-
-    if "date" not in out.columns:
-        out["date"] = pd.to_datetime(out["timestamp"], unit="ms", utc=True)
-    out = out.sort_values("date").reset_index(drop=True)
-    out.set_index("date", inplace=True)
-
-    required = {"prev_low", "prev_high", "bars_since_low", "bars_since_high", "low_exit", "high_exit", "low", "high", "close"}
-    missing = set(required) - set(out.columns)
+from math import floor, isnan
+from series import BarSeries, SignalSeries, NO_SIGNAL, LONG, SHORT, CLOSE, PROCESS_COLUMNS
+from config import ENTRY_PERIOD, DOLLAR_PER_POINT, RISK_PERCENT, INIT_ACCOUNT_VALUE, TICK_SIZE, COMMISSIONS, MARGIN
+
+TIMESPAN_MS = {"minute": 60_000, "hour": 3_600_000, "day": 86_400_000}
+
+def timeframe_ms(timeframe: str) -> int:
+    multiplier, timespan = timeframe.split(" ")
+    return int(multiplier) * TIMESPAN_MS[timespan]
+
+class IntrabarIndex:
+    """
+    Maps each parent bar to the range of 1-minute bars it contains, so a bar that touches
+    both the stop and the target can be replayed minute by minute to see which came first. The ranges are found once
+    with searchsorted over the timestamps; each lookup afterwards is a slice.
+    """
+
+    def __init__(self, parent_ts, minute_bars: BarSeries, parent_ms: int):
+        minute_bars = minute_bars.take(np.argsort(minute_bars.timestamp, kind="stable"))
+        child_ts = minute_bars.timestamp
+        parent_ts = np.asarray(parent_ts, dtype=np.int64)
+
+        self.high = minute_bars.high
+        self.low  = minute_bars.low
+
+        bar_ends = np.minimum(np.append(parent_ts[1:], np.iinfo(np.int64).max), parent_ts + parent_ms)
+        self.starts = np.searchsorted(child_ts, parent_ts, side="left")
+        self.ends   = np.searchsorted(child_ts, bar_ends, side="left")
+
+    def span(self, i: int) -> slice:
+        return slice(self.starts[i], self.ends[i])
+
+    def stop_first(self, i: int, stop: float, target: float, side: float) -> bool:
+        """Whether the stop traded before the target inside parent bar i. Ties and missing minutes count as stop."""
+        span = self.span(i)
+        if side == 1.0:
+            stop_touch, target_touch = self.low[span] <= stop, self.high[span] >= target
+        else:
+            stop_touch, target_touch = self.high[span] >= stop, self.low[span] <= target
+        if not target_touch.any():
+            return True
+        if not stop_touch.any():
+            return False
+        return stop_touch.argmax() <= target_touch.argmax()
+
+def calculate_signals(bars: BarSeries, minute_bars: BarSeries | None = None) -> SignalSeries:
+    ticker = bars.ticker
+    if bars.empty:
+        return SignalSeries(ticker, bars.timeframe)
+
+    required = ("open", "high", "low", "close") + PROCESS_COLUMNS
+    missing = [name for name in required if not bars.has(name)]
+    # Past the entry warm-up the channels must have values, or no signal can ever fire.
+    if len(bars) > ENTRY_PERIOD:
+        channels = ("high_entry", "low_entry", "high_exit", "low_exit", "prev_high", "prev_low")
+        missing += [name for name in channels if bars.has(name) and np.isnan(getattr(bars, name)).all()]
     if missing:
-        raise ValueError(f"DataFrame lacks required columns: {', '.join(sorted(missing))}")
-
-    out["position"]        = np.nan   
-    out["signal"]          = None    
-    out["entry_price"]     = np.nan 
-    out["stop_price"]      = np.nan  
-    out["target_price"]    = np.nan   
-    out["position_basis"]  = np.nan   
-    out["unit_size"]       = np.nan   
-    out["account_value"] = np.nan
-    out["wins"] = np.nan
-    out["losses"] = np.nan
-
-    first_idx = out.index[0]
-    out.at[first_idx, "position"]        = 0.0
-    out.at[first_idx, "signal"]          = "no signal"
-    out.at[first_idx, "entry_price"]     = np.nan
-    out.at[first_idx, "stop_price"]      = np.nan
-    out.at[first_idx, "target_price"]    = np.nan
-    out.at[first_idx, "position_basis"]  = np.nan
-    out.at[first_idx, "unit_size"]       = np.nan
-    out.at[first_idx, "account_value"] = INIT_ACCOUNT_VALUE
-    out.at[first_idx, "wins"] = 0.0
-    out.at[first_idx, "losses"] = 0.0
+        raise ValueError(f"BarSeries lacks required columns: {', '.join(sorted(missing))}")
+
+    bars = bars.take(np.argsort(bars.timestamp, kind="stable"))
+    n = len(bars)
+
+    open_, high, low, close = bars.open.tolist(), bars.high.tolist(), bars.low.tolist(), bars.close.tolist()
+    high_exit, low_exit = bars.high_exit.tolist(), bars.low_exit.tolist()
+    prev_high, prev_low = bars.prev_high.tolist(), bars.prev_low.tolist()
+    bars_since_high, bars_since_low = bars.bars_since_high.tolist(), bars.bars_since_low.tolist()
+
+    nan = float("nan")
+    position       = [0] * n
+    signal         = [NO_SIGNAL] * n
+    entry_price    = [nan] * n
+    stop_price     = [nan] * n
+    target_price   = [nan] * n
+    position_basis = [nan] * n
+    unit_size      = [nan] * n
+    account_value  = [nan] * n
+    wins           = [nan] * n
+    losses         = [nan] * n
+
+    account_value[0] = INIT_ACCOUNT_VALUE
+    wins[0] = 0.0
+    losses[0] = 0.0
 
     tick = TICK_SIZE[ticker]
     dollars_per_point = DOLLAR_PER_POINT[ticker]
     commissions = COMMISSIONS[ticker]
     slippage = 4*tick*dollars_per_point
 
-    idx = list(out.index)
-
-    for i in range(1, len(out)):
-        prev_i = idx[i-1]
-        cur_i  = idx[i]
-
-        prev_pos        = out.at[prev_i, "position"]
-        prev_stop       = out.at[prev_i, "stop_price"]
-        prev_target     = out.at[prev_i, "target_price"]
-        prev_unit_size  = out.at[prev_i, "unit_size"]
-        prev_position_basis = out.at[prev_i, "position_basis"]
-        prev_account_value = out.at[prev_i, "account_value"]
-        prev_wins = out.at[prev_i, "wins"]
-        prev_losses = out.at[prev_i, "losses"]
-
-        out.at[cur_i, "position"]       = prev_pos
-        out.at[cur_i, "signal"]         = "no_signal"
-        out.at[cur_i, "stop_price"]     = prev_stop
-        out.at[cur_i, "target_price"]   = prev_target
-        out.at[cur_i, "unit_size"]      = prev_unit_size
-        out.at[cur_i, "position_basis"] = prev_position_basis
-        out.at[cur_i, "account_value"] = prev_account_value
-        out.at[cur_i, "wins"] = prev_wins
-        out.at[cur_i, "losses"] = prev_losses
-
-        if prev_pos == 1.0:
-            low_bar  = out.at[cur_i, "low"]
-            high_bar = out.at[cur_i, "high"]
-
-            stop_hit   = pd.notna(prev_stop)   and (low_bar  <= prev_stop)
-            target_hit = pd.notna(prev_target) and (high_bar >= prev_target)
+    intrabar = None
+    if minute_bars is not None and not minute_bars.empty:
+        parent_ms = timeframe_ms(bars.timeframe)
+        if parent_ms > TIMESPAN_MS["minute"]:
+            intrabar = IntrabarIndex(bars.timestamp, minute_bars, parent_ms)
+
+    def close_position(i, exit_price, side):
+        prev_account_value = account_value[i-1]
+        account_value[i] = prev_account_value + side * (exit_price - position_basis[i-1]) * unit_size[i-1] * dollars_per_point - 2*commissions*unit_size[i-1] - 2*slippage
+        if account_value[i] > prev_account_value:
+            wins[i] = wins[i-1] + 1.0
+        elif account_value[i] < prev_account_value:
+            losses[i] = losses[i-1] + 1.0
+
+        position[i]       = 0
+        signal[i]         = CLOSE
+        stop_price[i]     = nan
+        target_price[i]   = nan
+        position_basis[i] = nan
+        unit_size[i]      = nan
+
+    for i in range(1, n):
+        prev_pos           = position[i-1]
+        prev_stop          = stop_price[i-1]
+        prev_target        = target_price[i-1]
+        prev_account_value = account_value[i-1]
+
+        position[i]       = prev_pos
+        stop_price[i]     = prev_stop
+        target_price[i]   = prev_target
+        unit_size[i]      = unit_size[i-1]
+        position_basis[i] = position_basis[i-1]
+        account_value[i]  = prev_account_value
+        wins[i]           = wins[i-1]
+        losses[i]         = losses[i-1]
+
+        if prev_pos == 1:
+            stop_hit   = not isnan(prev_stop)   and (low[i]  <= prev_stop)
+            target_hit = not isnan(prev_target) and (high[i] >= prev_target)
+
+            if stop_hit and target_hit and intrabar is not None:
+                stop_hit = intrabar.stop_first(i, prev_stop, prev_target, 1.0)
 
             if stop_hit:
-                out.at[cur_i, "account_value"] = prev_account_value + (prev_stop - prev_position_basis) * prev_unit_size * dollars_per_point - 2*commissions*prev_unit_size - 2*slippage
-                if out.at[cur_i, "account_value"] > prev_account_value:
-                    out.at[cur_i, "wins"] = prev_wins + 1.0
-                elif out.at[cur_i, "account_value"] < prev_account_value:
-                    out.at[cur_i, "losses"] = prev_losses + 1.0
-
-                out.at[cur_i, "position"]       = 0.0
-                out.at[cur_i, "signal"]         = "close"
-                out.at[cur_i, "stop_price"]     = np.nan
-                out.at[cur_i, "target_price"]   = np.nan
-                out.at[cur_i, "position_basis"] = np.nan
-                out.at[cur_i, "unit_size"]      = np.nan
+                close_position(i, prev_stop, 1.0)
                 continue
             elif target_hit:
-                out.at[cur_i, "account_value"] = prev_account_value + (prev_target - prev_position_basis) * prev_unit_size * dollars_per_point - 2*commissions*prev_unit_size - 2*slippage
-                if out.at[cur_i, "account_value"] > prev_account_value:
-                    out.at[cur_i, "wins"] = prev_wins + 1.0
-                elif out.at[cur_i, "account_value"] < prev_account_value:
-                    out.at[cur_i, "losses"] = prev_losses + 1.0
-
-                out.at[cur_i, "position"]       = 0.0
-                out.at[cur_i, "signal"]         = "close"
-                out.at[cur_i, "stop_price"]     = np.nan
-                out.at[cur_i, "target_price"]   = np.nan
-                out.at[cur_i, "position_basis"] = np.nan
-                out.at[cur_i, "unit_size"]      = np.nan
+                close_position(i, prev_target, 1.0)
                 continue
 
-        elif prev_pos == -1.0:
-            low_bar  = out.at[cur_i, "low"]
-            high_bar = out.at[cur_i, "high"]
+        elif prev_pos == -1:
+            stop_hit   = not isnan(prev_stop)   and (high[i] >= prev_stop)
+            target_hit = not isnan(prev_target) and (low[i]  <= prev_target)
 
-            stop_hit   = pd.notna(prev_stop)   and (high_bar  >= prev_stop)
-            target_hit = pd.notna(prev_target) and (low_bar <= prev_target)
+            if stop_hit and target_hit and intrabar is not None:
+                stop_hit = intrabar.stop_first(i, prev_stop, prev_target, -1.0)
 
             if stop_hit:
-                out.at[cur_i, "account_value"] = prev_account_value - (prev_stop - prev_position_basis) * prev_unit_size * dollars_per_point - 2*commissions*prev_unit_size - 2*slippage
-                if out.at[cur_i, "account_value"] > prev_account_value:
-                    out.at[cur_i, "wins"] = prev_wins + 1.0
-                elif out.at[cur_i, "account_value"] < prev_account_value:
-                    out.at[cur_i, "losses"] = prev_losses + 1.0
-
-                out.at[cur_i, "position"]       = 0.0
-                out.at[cur_i, "signal"]         = "close"
-                out.at[cur_i, "stop_price"]     = np.nan
-                out.at[cur_i, "target_price"]   = np.nan
-                out.at[cur_i, "position_basis"] = np.nan
-                out.at[cur_i, "unit_size"]      = np.nan
+                close_position(i, prev_stop, -1.0)
                 continue
             elif target_hit:
-                out.at[cur_i, "account_value"] = prev_account_value - (prev_target - prev_position_basis) * prev_unit_size * dollars_per_point - 2*commissions*prev_unit_size - 2*slippage
-                if out.at[cur_i, "account_value"] > prev_account_value:
-                    out.at[cur_i, "wins"] = prev_wins + 1.0
-                elif out.at[cur_i, "account_value"] < prev_account_value:
-                    out.at[cur_i, "losses"] = prev_losses + 1.0
-
-                out.at[cur_i, "position"]       = 0.0
-                out.at[cur_i, "signal"]         = "close"
-                out.at[cur_i, "stop_price"]     = np.nan
-                out.at[cur_i, "target_price"]   = np.nan
-                out.at[cur_i, "position_basis"] = np.nan
-                out.at[cur_i, "unit_size"]      = np.nan
+                close_position(i, prev_target, -1.0)
                 continue
 
-        if prev_pos == 0.0:
-            y_signal = out.at[prev_i, "signal"]
-            y_entry  = out.at[prev_i, "entry_price"]
-            y_units  = out.at[prev_i, "unit_size"]
-            y_stop   = out.at[prev_i, "stop_price"]
-
-            cur_high = out.at[cur_i, "high"]
-            cur_low  = out.at[cur_i, "low"]
-            cur_open= out.at[cur_i, "open"]
-
-            if y_signal == "long" and pd.notna(y_entry) and pd.notna(y_units) and y_units >= 1:
-                if pd.notna(cur_high) and (cur_high >= y_entry):
-                    fill_price = float(max(cur_open, y_entry))
+        if prev_pos == 0:
+            y_signal = signal[i-1]
+            y_entry  = entry_price[i-1]
+            y_units  = unit_size[i-1]
+            y_stop   = stop_price[i-1]
 
-                    out.at[cur_i, "position"]       = 1.0
-                    out.at[cur_i, "signal"]         = "no signal"
-                    out.at[cur_i, "position_basis"] = fill_price
-                    out.at[cur_i, "unit_size"]      = int(y_units)
-                    out.at[cur_i, "stop_price"]     = float(y_stop) if pd.notna(y_stop) else np.nan
+            if y_signal == LONG and not isnan(y_entry) and not isnan(y_units) and y_units >= 1:
+                if not isnan(high[i]) and (high[i] >= y_entry):
+                    fill_price = float(max(open_[i], y_entry))
 
-                    high_exit_bar = out.at[cur_i, "high_exit"]
-                    out.at[cur_i, "target_price"] = float(high_exit_bar) if pd.notna(high_exit_bar) else np.nan
+                    position[i]       = 1
+                    position_basis[i] = fill_price
+                    unit_size[i]      = int(y_units)
+                    stop_price[i]     = y_stop
+                    target_price[i]   = high_exit[i]
 
-            elif y_signal == "short" and pd.notna(y_entry) and pd.notna(y_units) and y_units >= 1:
-                if pd.notna(cur_low) and (cur_low <= y_entry):
-                    fill_price = float(min(cur_open, y_entry))
+            elif y_signal == SHORT and not isnan(y_entry) and not isnan(y_units) and y_units >= 1:
+                if not isnan(low[i]) and (low[i] <= y_entry):
+                    fill_price = float(min(open_[i], y_entry))
 
-                    out.at[cur_i, "position"]       = -1.0
-                    out.at[cur_i, "signal"]         = "no signal"
-                    out.at[cur_i, "position_basis"] = fill_price
-                    out.at[cur_i, "unit_size"]      = int(y_units)
-                    out.at[cur_i, "stop_price"]     = float(y_stop) if pd.notna(y_stop) else np.nan
+                    position[i]       = -1
+                    position_basis[i] = fill_price
+                    unit_size[i]      = int(y_units)
+                    stop_price[i]     = y_stop
+                    target_price[i]   = low_exit[i]
 
-                    low_exit_bar = out.at[cur_i, "low_exit"]
-                    out.at[cur_i, "target_price"] = float(low_exit_bar) if pd.notna(low_exit_bar) else np.nan
+        if position[i] == 0:
+            close_bar = close[i]
 
-        if out.at[cur_i, "position"] == 0.0:
-            prevL_bar   = out.at[cur_i, "prev_low"]
-            bars_since_low  = out.at[cur_i, "bars_since_low"]
-            close_bar     = out.at[cur_i, "close"]
-            low_bar       = out.at[cur_i, "low"]
+            cond_breakdown = (not isnan(prev_low[i]) and not isnan(close_bar) and (close_bar < prev_low[i]))
+            cond_old_long  = (not isnan(bars_since_low[i]) and bars_since_low[i] > 3)
 
-            cond_breakdown = (pd.notna(prevL_bar) and pd.notna(close_bar) and (close_bar < prevL_bar))
-            cond_old_long       = (pd.notna(bars_since_low) and bars_since_low > 3)
-
-            if cond_breakdown and cond_old_long and pd.notna(low_bar):
-                planned_entry_L = float(prevL_bar)
-                planned_stop_L  = float(low_bar - tick)
+            if cond_breakdown and cond_old_long and not isnan(low[i]):
+                planned_entry_L = prev_low[i]
+                planned_stop_L  = low[i] - tick
 
                 risk_points = abs(planned_entry_L - planned_stop_L)
                 if risk_points > 0 and dollars_per_point > 0:
@@ -199,22 +193,18 @@ def calculate_signals(df, ticker):
                 else:
                     planned_units_L = 0
 
-                out.at[cur_i, "signal"]      = "long"
-                out.at[cur_i, "entry_price"] = planned_entry_L
-                out.at[cur_i, "stop_price"]  = planned_stop_L
-                out.at[cur_i, "unit_size"]   = int(planned_units_L) if planned_units_L >= 1 else np.nan
-                out.at[cur_i, "target_price"]    = out.at[cur_i, "high_exit"]
-
-            prevH_bar   = out.at[cur_i, "prev_high"]
-            bars_since_high  = out.at[cur_i, "bars_since_high"]
-            high_bar       = out.at[cur_i, "high"]
+                signal[i]       = LONG
+                entry_price[i]  = planned_entry_L
+                stop_price[i]   = planned_stop_L
+                unit_size[i]    = int(planned_units_L) if planned_units_L >= 1 else nan
+                target_price[i] = high_exit[i]
 
-            cond_breakup = (pd.notna(prevH_bar) and pd.notna(close_bar) and (close_bar > prevH_bar))
-            cond_old_short       = (pd.notna(bars_since_high) and bars_since_high > 3)
+            cond_breakup   = (not isnan(prev_high[i]) and not isnan(close_bar) and (close_bar > prev_high[i]))
+            cond_old_short = (not isnan(bars_since_high[i]) and bars_since_high[i] > 3)
 
-            if cond_breakup and cond_old_short and pd.notna(high_bar):
-                planned_entry_S = float(prevH_bar)
-                planned_stop_S  = float(high_bar + tick)
+            if cond_breakup and cond_old_short and not isnan(high[i]):
+                planned_entry_S = prev_high[i]
+                planned_stop_S  = high[i] + tick
 
                 risk_points = abs(planned_entry_S - planned_stop_S)
                 if risk_points > 0 and dollars_per_point > 0:
@@ -222,25 +212,29 @@ def calculate_signals(df, ticker):
                 else:
                     planned_units_S = 0
 
-                out.at[cur_i, "signal"]      = "short"
-                out.at[cur_i, "entry_price"] = planned_entry_S
-                out.at[cur_i, "stop_price"]  = planned_stop_S
-                out.at[cur_i, "unit_size"]   = int(planned_units_S) if planned_units_S >= 1 else np.nan
-                out.at[cur_i, "target_price"]    = out.at[cur_i, "low_exit"]
-
-        if out.at[cur_i, "position"] == 1.0:
-            low_bar = out.at[cur_i, "low"]
-            if pd.notna(low_bar) and low_bar > out.at[cur_i, "position_basis"]:
-                out.at[cur_i, "stop_price"] = float(low_bar - tick)
-
-            if "high_exit" in out.columns and pd.notna(out.at[cur_i, "high_exit"]):
-                out.at[cur_i, "target_price"] = float(out.at[cur_i, "high_exit"])
-        elif out.at[cur_i, "position"] == -1.0:
-            high_bar = out.at[cur_i, "high"]
-            if pd.notna(high_bar) and high_bar < out.at[cur_i, "position_basis"]:
-                out.at[cur_i, "stop_price"] = float(high_bar + tick)
-
-            if "low_exit" in out.columns and pd.notna(out.at[cur_i, "low_exit"]):
-                out.at[cur_i, "target_price"] = float(out.at[cur_i, "low_exit"])
-
-    return out
+                signal[i]       = SHORT
+                entry_price[i]  = planned_entry_S
+                stop_price[i]   = planned_stop_S
+                unit_size[i]    = int(planned_units_S) if planned_units_S >= 1 else nan
+                target_price[i] = low_exit[i]
+
+        if position[i] == 1:
+            if not isnan(low[i]) and low[i] > position_basis[i]:
+                stop_price[i] = low[i] - tick
+
+            if not isnan(high_exit[i]):
+                target_price[i] = high_exit[i]
+        elif position[i] == -1:
+            if not isnan(high[i]) and high[i] < position_basis[i]:
+                stop_price[i] = high[i] + tick
+
+            if not isnan(low_exit[i]):
+                target_price[i] = low_exit[i]
+
+    return SignalSeries(
+        ticker, bars.timeframe,
+        timestamp=bars.timestamp, signal=signal, position=position,
+        entry_price=entry_price, stop_price=stop_price, target_price=target_price,
+        position_basis=position_basis, unit_size=unit_size, account_value=account_value,
+        wins=wins, losses=losses,
+    )
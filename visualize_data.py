@@ -1,26 +1,35 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 import sqlite3
 
 from config import DB_PATH, INIT_ACCOUNT_VALUE, TICKERS, TIMEFRAMES
+from series import SignalSeries
 
-def build_series(df: pd.DataFrame) -> pd.Series:
-    if df.empty or "timestamp" not in df.columns or "account_value" not in df.columns:
+def build_series(signals: SignalSeries) -> pd.Series:
+    if signals.empty:
         return pd.Series(dtype=float)
 
-    dates = pd.to_datetime(df["timestamp"], unit="ms", utc=True)
-    values = pd.to_numeric(df["account_value"], errors="coerce")
-    
-    s = pd.Series(dict(zip(dates,values)), index=dates).sort_index()
+    order = np.argsort(signals.timestamp, kind="stable")
+    timestamps = signals.timestamp[order]
+    values = signals.account_value[order]
+
+    last = np.append(timestamps[1:] != timestamps[:-1], True)
+    timestamps, values = timestamps[last], values[last]
 
-    s = s[~s.index.duplicated(keep="last")]
+    keep = np.isfinite(values)
 
-    s = s.replace([np.inf, -np.inf], np.nan).dropna()
+    return pd.Series(values[keep], index=pd.to_datetime(timestamps[keep], unit="ms", utc=True))
 
-    return s
+def downsample(s: pd.Series, max_points: int) -> pd.Series:
+    """Keeps the last point of max_points evenly sized buckets, so the final value is exact."""
+    if len(s) <= max_points:
+        return s
+    ends = np.linspace(0, len(s), max_points + 1)[1:].astype(int) - 1
+    return s.iloc[np.unique(ends)]
 
 def plot_account_value(db_path: str = DB_PATH):
+    import matplotlib.pyplot as plt
+
     connection = sqlite3.connect(db_path)
     cursor = connection.cursor()
 
@@ -29,10 +38,10 @@ def plot_account_value(db_path: str = DB_PATH):
 
         for ticker in TICKERS:
             data = cursor.execute("SELECT timestamp, account_value FROM signals WHERE ticker = ? AND timeframe = ? ORDER BY timestamp ASC", (ticker, timeframe)).fetchall()
-            df = pd.DataFrame(data, columns=['timestamp', 'account_value'])
+            signals = SignalSeries.from_rows(ticker, timeframe, data, ("timestamp", "account_value"))
 
             try:
-                plot_df = build_series(df)
+                plot_df = build_series(signals)
             except Exception:
                 #logger.error(f"{ticker}: error in build_series", exc_info=True)
                 continue